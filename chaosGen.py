@@ -1,9 +1,156 @@
+import hashlib
+import os
+import pathlib
+import tempfile
+import zipfile
 import numpy as np
-from scipy.integrate import odeint
 from scipy.optimize import brentq
+from numba import njit, prange
 
 logistic = lambda x : 4*x*(1-x)
 
+##########################################################################
+# Compiled kernels for the hot maps/flows. They are kept at module scope so
+# that numba compiles (and caches) them once per process rather than per
+# generator object
+#
+# NOTE - The maps and flows are compiled without fastmath, as contracting or
+# reassociating their arithmetic changes the iterates and so the dynamics
+##########################################################################
+
+@njit(cache=True)
+def _logistic (x, r, one) :
+    """
+    Logistic map for a single point, one is 1 in the dtype of x so that
+    single precision is not promoted to double
+    """
+
+    return r*x*(one - x)
+
+@njit(cache=True)
+def _tent (x, mu, mu_inv, mu1_inv, one) :
+    """
+    Tent map for a single point, mu_inv = 1/mu and mu1_inv = 1/(1-mu)
+    and one as in _logistic. The select is branchless once compiled
+    """
+
+    return x*mu_inv if x <= mu else (one - x)*mu1_inv
+
+def _specialise (fmap, consts, Np, D) :
+    """
+    Compiles the kernels of the scalar map fmap(x, *consts) with the
+    constants and the (Np, D) shape baked in as compile-time literals
+    Returns (step, iterate) where
+        step(x, out)    - out = fmap(x) elementwise
+        iterate(x, out) - Cascaded map, x is the state of shape (gens, D)
+                       and out has shape (gens, Np, D). Every (generator,
+                       dimension) pair is iterated Np times in place,
+                       out[g,i,d] recording the state before the i-th iterate
+    """
+
+    @njit(parallel=True)
+    def step (x, out) :
+        xf, of = x.reshape(-1), out.reshape(-1)
+        for i in prange(xf.size) :
+            of[i] = fmap(xf[i], *consts)
+
+    @njit(parallel=True)
+    def iterate (x, out) :
+        for j in prange(out.shape[0]*D) :
+            g, d = j // D, j % D
+            v = x[g,d]
+            for i in range(Np) :
+                out[g,i,d] = v
+                v = fmap(v, *consts)
+            x[g,d] = v
+
+    return step, iterate
+
+@njit(cache=True)
+def _lorenz_rhs (x, y, z, sigma, beta, rho) :
+    """ Lorenz differential equation for a single point """
+
+    return sigma*(y-x), x*(rho-z) - y, x*y - beta*z
+
+@njit(cache=True)
+def _lorenz_rk4 (x, y, z, h, h2, h6, sigma, beta, rho) :
+    """
+    One classical RK4 step of the lorenz flow for a single point
+    h2 = h/2 and h6 = h/6 are passed in, as are all the parameters, so that
+    no integer literal promotes single precision arithmetic to double
+    """
+
+    a1, b1, c1 = _lorenz_rhs(x, y, z, sigma, beta, rho)
+    a2, b2, c2 = _lorenz_rhs(x + h2*a1, y + h2*b1, z + h2*c1, sigma, beta, rho)
+    a3, b3, c3 = _lorenz_rhs(x + h2*a2, y + h2*b2, z + h2*c2, sigma, beta, rho)
+    a4, b4, c4 = _lorenz_rhs(x + h*a3, y + h*b3, z + h*c3, sigma, beta, rho)
+
+    return (x + h6*(a1 + (a2 + a2) + (a3 + a3) + a4),
+            y + h6*(b1 + (b2 + b2) + (b3 + b3) + b4),
+            z + h6*(c1 + (c2 + c2) + (c3 + c3) + c4))
+
+@njit(parallel=True, cache=True)
+def _lorenz_rk4_batch (X, T, h, h2, h6, sigma, beta, rho) :
+    """
+    Advances every point of X T RK4 steps in place, X has shape (3, ...)
+    with each component contiguous
+    """
+
+    x, y, z = X[0].reshape(-1), X[1].reshape(-1), X[2].reshape(-1)
+    for i in prange(x.size) :
+        xi, yi, zi = x[i], y[i], z[i]
+        for _ in range(T) :
+            xi, yi, zi = _lorenz_rk4(xi, yi, zi, h, h2, h6, sigma, beta, rho)
+        x[i], y[i], z[i] = xi, yi, zi
+
+@njit(parallel=True, cache=True)
+def _lorenz_sample_all (X, h, h2, h6, sigma, beta, rho, comp, mn, scale, lo, hi, out) :
+    """
+    Fused sampling and evolution in a single pass over X of shape
+    (gens, 3, ...), out has shape (gens, K, n) where n is the number of
+    points per generator. Every point writes its comp-th component
+    normalised with (x - mn)*scale and clipped to [lo, hi] into out, and
+    is then advanced one RK4 step in place, K times in a row (K=Np for
+    cascade). The points of all generators run in parallel
+    """
+
+    G, K, n = out.shape
+    P = X.reshape(G, 3, n)
+    for j in prange(G*n) :
+        g, i = j // n, j % n
+        x, y, z = P[g,0,i], P[g,1,i], P[g,2,i]
+        for k in range(K) :
+            v = x if comp == 0 else (y if comp == 1 else z)
+            out[g,k,i] = min(max((v - mn)*scale, lo), hi)
+            x, y, z = _lorenz_rk4(x, y, z, h, h2, h6, sigma, beta, rho)
+        P[g,0,i], P[g,1,i], P[g,2,i] = x, y, z
+
+@njit(cache=True)
+def _lorenz_limits (X, steps, h, h2, h6, sigma, beta, rho) :
+    """
+    Integrates a single point X (shape (3,)) for the given number of RK4
+    steps and returns the (3,2) matrix of [min, max] of every component
+    """
+
+    x, y, z = X[0], X[1], X[2]
+    lims = np.empty((3, 2))
+    lims[:,0], lims[:,1] = X, X
+
+    for _ in range(steps) :
+        x, y, z = _lorenz_rk4(x, y, z, h, h2, h6, sigma, beta, rho)
+        lims[0,0], lims[0,1] = min(lims[0,0], x), max(lims[0,1], x)
+        lims[1,0], lims[1,1] = min(lims[1,0], y), max(lims[1,1], y)
+        lims[2,0], lims[2,1] = min(lims[2,0], z), max(lims[2,1], z)
+
+    return lims
+
+def _readonly (a) :
+    """ Returns a non-writeable view of a """
+
+    v = a.view()
+    v.setflags(write=False)
+    return v
+
 class ChaosGenerator () :
     """
     Base class for the chaotic generator
@@ -16,7 +163,7 @@ class ChaosGenerator () :
 
         return (lambda s : lambda i : ChaosGenerator.cgen[gentype](s).chaosPoints(i))(shape)
 
-    def __init__ (self, oshape, gshape=None, cascade=True, gens=2) :
+    def __init__ (self, oshape, gshape=None, cascade=True, gens=2, dtype=np.float64, seed=None) :
         """
         Child classes use this constructor to initialise essential parameters
         and the internal generators
@@ -32,6 +179,12 @@ class ChaosGenerator () :
                    independent of the other, however!
             gens    - Number of independent internal chaotic generators. Two by
                    default for chaotic pso
+            dtype   - Floating point type of the internal generators. Double
+                   precision by default, np.float32 halves the memory traffic
+                   but maps like the logistic map then collapse onto their
+                   fixed point 0 and the tent map onto short cycles
+            seed    - Seed of the random number generator that initialises the
+                   internal generators
         """
 
         self.oshape = oshape
@@ -43,19 +196,28 @@ class ChaosGenerator () :
         # NOTE - By default, if map is single dimensional, then the last shape
         # dimension (of 1) is omitted
         ######################################################################
-        self.gshape = (lambda s: s[1:] if cascade else s)(oshape if gshape is None else gshape)
+        gshape = oshape if gshape is None else gshape
+        self.gshape = gshape[1:] if cascade else gshape
         self.cascade = cascade
         self.gens = gens
+        self.dtype = np.dtype(dtype).type
 
-        # Creating the list of generators with shape (gens, Np, D, cdims)
-        self.cgens = np.array([
-            np.random.random_sample(self.gshape)
-            for i in range(gens)
-        ])
+        # Creating the generators with shape (gens, Np, D, cdims), filled by
+        # a single call of the PRNG
+        self._rng = np.random.default_rng(seed)
+        cgens = np.empty((gens,) + self.gshape, dtype=self.dtype)
+        self._rng.random(out=cgens, dtype=self.dtype)
+        self.cgens = cgens
 
     def getCgens (self) :
-        """ Returns a copy of the internal generators """
-        return np.copy (self.cgens)
+        """
+        Returns a read-only view of the current state of the internal
+        generators. It is only valid until the generators are next evolved,
+        as double buffered maps move their state to the other buffer. Use
+        .copy() on it if it needs to be mutated or kept
+        """
+
+        return _readonly(self.cgens)
 
     def chaosPoints (self, gno=0) :
         """
@@ -65,47 +227,154 @@ class ChaosGenerator () :
                 shape (gens, Np, D)
                 - If !=0 means to evolve a particular generator (indexed from 1) rand
                 return a matrix of shape (Np, D)
+
+        NOTE - Double buffered maps (Logistic, Tent) return a read-only view into
+        an internal buffer that later calls overwrite, use .copy() on it to keep
+        the points. The other maps return a fresh array every call
         """
 
         if gno :
             if self.cascade :
-                # Evolve per particle
-                return np.array ([
-                    self.evolve(gno-1) for i in range(self.oshape[0])
-                ])
+                # Evolve per particle. Points are written out immediately as
+                # evolve may return a view into a buffer that is reused
+                ret = np.empty(self.oshape, dtype=self.dtype)
+                for i in range(self.oshape[0]) :
+                    ret[i] = self.evolve(gno-1)
+                return ret
             else :
                 return self.evolve(gno-1)
         else :
-            # Evolve per generator (independent of 'cascade') --> Recursive call
-            return np.array ([
-                self.chaosPoints(i+1) for i in range(self.gens)
-            ])
+            return self.evolveAll()
+
+    def evolveAll (self) :
+        """
+        Evolves every generator (independent of 'cascade') and returns the
+        points as a matrix of shape (gens, Np, D)
+        """
+
+        ret = np.empty((self.gens,) + self.oshape, dtype=self.dtype)
+        for i in range(self.gens) :
+            ret[i] = self.chaosPoints(i+1)
+
+        return ret
 
 
-class Logistic (ChaosGenerator) :
+class DoubleBuffered (ChaosGenerator) :
     """
-    Logistic map --> f(x) = r*x*(1-x)
-    r = 4 for full chaos
+    Base class for maps that evolve every point independently of the others
+    Keeps two buffers per generator, the next state is written into the one
+    not in use so that evolve can return the previous state without a copy
     """
 
-    def __init__ (self, oshape, r=4, cascade=True, gens=2) :
+    # Specialised kernels, {(map, constants, dtype, Np, D) : (step, iterate)}
+    kernels = {}
+
+    def _make_kernel (self, fmap, *consts) :
         """
-        r - logistic bifurcation parameter
-        Rest is defined in the parent class
+        Returns the (step, iterate) kernels of the scalar map fmap(x, *consts)
+        specialised for this generator. Kernels are only compiled once per
+        process for the same configuration
         """
 
-        super().__init__(oshape, None, cascade, gens)
-        self.r = r
+        key = (fmap, consts, self.dtype, self.oshape[0], self.oshape[-1])
+        if key not in DoubleBuffered.kernels :
+            DoubleBuffered.kernels[key] = _specialise(fmap, consts, *key[-2:])
+
+        return DoubleBuffered.kernels[key]
+
+    @property
+    def cgens (self) :
+        """
+        Current state of all the generators, a view into the buffer in use
+        so that writes to it go through. Only valid until the next evolve
+        """
+
+        self.align()
+        return self._bufs[self._cur[0]]
+
+    @cgens.setter
+    def cgens (self, cgens) :
+        # Buffers of shape (2, gens, Np, D), first one holds the initial state
+        self._bufs = np.empty((2,) + cgens.shape, dtype=cgens.dtype)
+        self._bufs[0] = cgens
+        self._cur = np.zeros(cgens.shape[0], dtype=int)
+
+        # Output of cascaded evolution, (gens, Np, D)
+        self._out = np.empty((cgens.shape[0],) + self.oshape, dtype=cgens.dtype)
+
+    def flip (self, gind) :
+        """
+        Returns (current, next) state buffers of a generator and swaps them
+        The returned current state stays valid until the generator is evolved
+        again
+        """
+
+        cur = self._cur[gind]
+        self._cur[gind] = 1 - cur
+        return self._bufs[cur, gind], self._bufs[1-cur, gind]
+
+    def align (self) :
+        """ Brings the state of all generators into the same buffer """
+
+        cur = self._cur[0]
+        lag = self._cur != cur
+        if lag.any() :
+            self._bufs[cur, lag] = self._bufs[1-cur, lag]
+            self._cur[lag] = cur
 
     def evolve (self, gind) :
-        """ Evolves according to the logistic map """
+        """
+        Evolves a generator by one iterate of the map, returns a read-only
+        view of the previous state
+        """
 
-        # Copying is necessary
-        x, r = self.cgens[gind], self.r
-        ret = np.copy(x)
+        x, nxt = self.flip(gind)
+        self._step(x, nxt)
+        return _readonly(x)
 
-        self.cgens[gind] = r*x*(1-x)
-        return ret
+    def chaosPoints (self, gno=0) :
+        """
+        Same as in the base class, but the returned matrix is a read-only view
+        into an internal buffer that is overwritten by later calls
+        """
+
+        if gno and self.cascade :
+            g = gno-1
+            self._iterate(self._bufs[self._cur[g], g:g+1], self._out[g:g+1])
+            return _readonly(self._out[g])
+        else :
+            return super().chaosPoints(gno)
+
+    def evolveAll (self) :
+        """ Evolves all generators at once, returns a view as in chaosPoints """
+
+        self.align()
+        cur = self._cur[0]
+
+        if self.cascade :
+            self._iterate(self._bufs[cur], self._out)
+            return _readonly(self._out)
+        else :
+            self._step(self._bufs[cur], self._bufs[1-cur])
+            self._cur[:] = 1 - cur
+            return _readonly(self._bufs[cur])
+
+
+class Logistic (DoubleBuffered) :
+    """
+    Logistic map --> f(x) = r*x*(1-x)
+    r = 4 for full chaos
+    """
+
+    def __init__ (self, oshape, r=4, cascade=True, gens=2, dtype=np.float64, seed=None) :
+        """
+        r - logistic bifurcation parameter
+        Rest is defined in the parent class
+        """
+
+        super().__init__(oshape, None, cascade, gens, dtype, seed)
+        self.r = self.dtype(r)
+        self._step, self._iterate = self._make_kernel(_logistic, self.r, self.dtype(1))
 
 
 class InverseLE (ChaosGenerator) :
@@ -143,16 +412,16 @@ class InverseLE (ChaosGenerator) :
 
         plist = [brentq(lep, lo+eps, mid-eps), brentq(lep, mid+eps, hi-eps)]
         self.invmap = np.vectorize(cmap(plist[
-            1 if np.random.rand() >= 0.5 else 0
+            1 if self._rng.random() >= 0.5 else 0
         ]))
 
-    def __init__ (self, oshape, le=1.28991999999, cascade=True, gens=2) :
+    def __init__ (self, oshape, le=1.28991999999, cascade=True, gens=2, dtype=np.float64, seed=None) :
         """
 			le      - The lyapunov exponent whose map has to be found
 			Rest is defined in the base class
 		"""
 
-        super().__init__(oshape, None, cascade, gens)
+        super().__init__(oshape, None, cascade, gens, dtype, seed)
         self.le = le
 
         if le == np.log(2) :
@@ -172,26 +441,19 @@ class InverseLE (ChaosGenerator) :
         return ret
 
 
-class Tent (ChaosGenerator) :
+class Tent (DoubleBuffered) :
     """Tent map --> f(x) = 2*x , x <= 0.5 ; 2*(1-x) , x > 0.5
     mu = 0.49999 in the equivalent form for numerical stability"""
 
-    def __init__ (self, oshape, mu=0.49999, cascade=True, gens=2) :
+    def __init__ (self, oshape, mu=0.49999, cascade=True, gens=2, dtype=np.float64, seed=None) :
         """mu - Tent bifurcation paramater
         Rest is defined in the parent class"""
 
-        super().__init__(oshape, None, cascade, gens)
-        self.mu = mu
-
-    def evolve (self, gind) :
-        """Evolves according to the tent map"""
-
-        # Copying is necessary
-        x, mu = self.cgens[gind], self.mu
-        ret = np.copy(x)
-
-        self.cgens[gind] = np.where(x <= mu, x/mu, (1-x)/(1-mu))
-        return ret
+        super().__init__(oshape, None, cascade, gens, dtype, seed)
+        self.mu = self.dtype(mu)
+        self.mu_inv = self.dtype(1/mu)
+        self.mu1_inv = self.dtype(1/(1-mu))
+        self._step, self._iterate = self._make_kernel(_tent, self.mu, self.mu_inv, self.mu1_inv, self.dtype(1))
 
 
 class Lorenz (ChaosGenerator) :
@@ -200,32 +462,67 @@ class Lorenz (ChaosGenerator) :
                         ydot = x*(rho-z) - y
                         zdot = x*y - beta*z
     sigma, beta, rho = 10, 8/3, 28
+
+    Generators are stored as a structure of arrays of shape (gens, 3, Np, D)
+    so that every component of the flow is contiguous
     """
 
 	# lims is a dictonary containing {(sigma, beta, rho) : limits(3,2)} pairs
     lims = {}
 
-    def lorenz (X, t, sigma, beta, rho) :
-        """ lorenz differential equation needed by scipy odeint """
+    # Time step and number of RK4 steps of the run that finds the limits,
+    # the same time span of ~10000 as the original odeint trajectory
+    lims_h, lims_steps = 0.01, 1000000
 
-        x, y, z = X
-        dXdt = [sigma*(y-x), x*(rho-z) - y, x*y - beta*z]
-        return dXdt
+    # Limits are also saved here so that they are computed once across runs
+    cache_dir = pathlib.Path.home() / ".cache" / "cpso"
 
     def setLimits (params) :
         """
         No need to recalculate limits of the lorenz flow everytime for the
-        same set of parameters
+        same set of parameters, neither in this process nor in later ones
         """
 
         if params not in Lorenz.lims :
-            # Argument to lambda - (Time series of lorenz flow in all three dimensions)
-            Lorenz.lims[params] = (lambda s:np.array([
-                [np.min(s[:,i]), np.max(s[:,i])] for i in [0, 1, 2]
-            ]))\
-            (odeint (Lorenz.lorenz, np.random.rand(3), np.linspace (0, 9999, 999999), args = params))
-
-    def __init__ (self, oshape, params=(10, 8.0/3, 28), cascade=True, comp=0, h=0.01, gens=2) :
+            # Integration settings are part of the key so that stale limits are
+            # not reused when they change
+            settings = (params, Lorenz.lims_h, Lorenz.lims_steps)
+            key = hashlib.sha1(repr(settings).encode()).hexdigest()
+            path = Lorenz.cache_dir / "lorenz_lims_{}.npy".format(key)
+
+            # A missing or unreadable cache file means recomputing the limits
+            try :
+                lims = np.load(path)
+                if getattr(lims, "shape", None) != (3, 2) :
+                    lims = None
+            except (OSError, ValueError, EOFError, zipfile.BadZipFile) :
+                lims = None
+
+            if lims is None :
+                # Fixed-step RK4 run of the flow, from a fixed start point so
+                # that the limits (and so seeded generators) are reproducible
+                X = np.random.default_rng(0).random(3)
+                h = Lorenz.lims_h
+                lims = _lorenz_limits(X, Lorenz.lims_steps, h, h/2, h/6, *params)
+
+                # Caching on disk is best effort. Written to a temporary file
+                # first so that concurrent processes never read a partial file
+                try :
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    fd, tmp = tempfile.mkstemp(suffix=".npy", dir=path.parent)
+                    try :
+                        with os.fdopen(fd, "wb") as f :
+                            np.save(f, lims)
+                        os.replace(tmp, path)
+                    except OSError :
+                        os.remove(tmp)
+                        raise
+                except OSError :
+                    pass
+
+            Lorenz.lims[params] = lims
+
+    def __init__ (self, oshape, params=(10, 8.0/3, 28), cascade=True, comp=0, h=0.01, gens=2, dtype=np.float64, seed=None) :
         """"
         params  - (sigma, beta, rho) of lorenz parameters
         comp    - which cdim to consider for chaotic numbers
@@ -233,14 +530,23 @@ class Lorenz (ChaosGenerator) :
         Rest is defined in the parent class
         """
 
-        super().__init__ (oshape, oshape+(3,), cascade, gens)
+        super().__init__ (oshape, oshape+(3,), cascade, gens, dtype, seed)
         self.params = params
         self.comp = comp
-        self.h = h
+        self.h = self.dtype(h)
+
+        # RK4 step sizes (h, h/2, h/6) and flow parameters in the generator
+        # dtype, as passed to the kernels
+        self._flow = tuple(self.dtype(p) for p in (h, h/2, h/6) + tuple(params))
 
         # Set limits if not set already
         Lorenz.setLimits (params)
 
+        # Limits bound once, normalisation constants of the chosen component
+        self._lims = lims = Lorenz.lims[params]
+        self._lmin = self.dtype(lims[comp,0])
+        self._lscale = self.dtype(1/(lims[comp,1] - lims[comp,0]))
+
         ######################################################################
         # !!! IDEA FOR OOP
         # Introduce two subclasses - Normalised, and unnormalised
@@ -248,13 +554,15 @@ class Lorenz (ChaosGenerator) :
         # below (Also seen in Henon map)
         ######################################################################
 
-        # Per generator
-        for i in range(0, self.gens) :
-            # Per dimension of lorenz flow
-            for j in [0, 1, 2] :
-                self.cgens[i,...,j] = (lambda st,mn,mx : mn + (mx - mn)*st)\
-                                    (self.cgens[i,...,j], Lorenz.lims[params][j,0], Lorenz.lims[params][j,1])
-                # Argument to lambda - (ith generator jth cdim, min of jth cdim, max of jth cdim)
+        # (gens, Np, D, 3) --> (gens, 3, Np, D)
+        self.gshape = self.gshape[-1:] + self.gshape[:-1]
+        self.cgens = np.ascontiguousarray(np.moveaxis(self.cgens, -1, 1))
+
+        # Scale every dimension of the lorenz flow into its limits at once,
+        # (3,) vectors broadcast along the component axis
+        bshape = (3,) + (1,)*(len(self.gshape) - 1)
+        self.cgens *= (lims[:,1] - lims[:,0]).astype(self.dtype).reshape(bshape)
+        self.cgens += lims[:,0].astype(self.dtype).reshape(bshape)
 
     def evolveT (self, gind, T=1) :
         """
@@ -262,10 +570,8 @@ class Lorenz (ChaosGenerator) :
         and sets the internal generator
         """
 
-        for pt in np.ndindex(self.gshape[:-1]) :
-        # Per index in (Np, D)
-            self.cgens[gind][pt] = odeint(Lorenz.lorenz, self.cgens[gind][pt],
-                                          np.arange(0,self.h*(T+1),self.h), args=self.params)[-1]
+        # Classical fixed-step RK4 applied to every (Np, D) point at once
+        _lorenz_rk4_batch(self.cgens[gind], T, *self._flow)
 
     def evolve (self, gind) :
         """
@@ -273,23 +579,46 @@ class Lorenz (ChaosGenerator) :
         Lorenz flow equations
         """
 
+        return self._sample(gind, gind+1, 1).reshape(self.gshape[1:])
+
+    def chaosPoints (self, gno=0) :
+        """
+        Same as in the base class, a cascaded generator is iterated Np times
+        by a single kernel instead of once per particle
+        """
+
+        if gno and self.cascade :
+            return self._sample(gno-1, gno, self.oshape[0]).reshape(self.oshape)
+        else :
+            return super().chaosPoints(gno)
+
+    def evolveAll (self) :
+        """
+        Evolves every generator in a single parallel kernel, see evolve
+        for the normalisation. Returns a matrix of shape (gens, Np, D)
+        """
+
+        # With cascade, every (generator, dimension) point is iterated Np times
+        K = self.oshape[0] if self.cascade else 1
+        return self._sample(0, self.gens, K).reshape((self.gens,) + self.oshape)
+
+    def _sample (self, start, stop, K) :
+        """
+        Samples and steps every point of generators start to stop-1 K times
+        in a row with _lorenz_sample_all, returns a matrix of shape
+        (stop-start, K, n) where n is the number of points per generator
+        """
+
         ######################################################################
-        # If the limits defined in the dict 'lims' are exceeded, then
-        # corresponding chaotic points are replaced with eps or (1-eps) depending
-        # on whether its exceeding below or above, respectively
+        # Normalised points are clipped to [eps, 1-eps], so points
+        # exceeding the limits in the dict 'lims' are replaced with eps or
+        # (1-eps) depending on whether its exceeding below or above
         ######################################################################
         eps = 1e-5
 
-        # Copying is not necessary as it is being scaled
-        ret = (lambda n2 : np.where (n2 > 1, 1-eps, n2))(
-                (lambda n1 : np.where (n1 < 0, eps, n1))(
-                    (lambda st, mn, mx : (st - mn)/(mx - mn))
-                    (self.cgens[gind,...,self.comp],
-                     Lorenz.lims[self.params][self.comp,0],
-                     Lorenz.lims[self.params][self.comp,1])
-                ))
-
-        self.evolveT (gind)
+        ret = np.empty((stop-start, K, int(np.prod(self.gshape[1:]))), dtype=self.dtype)
+        _lorenz_sample_all(self.cgens[start:stop], *self._flow, self.comp, self._lmin,
+                           self._lscale, self.dtype(eps), self.dtype(1-eps), ret)
         return ret
 
 
@@ -306,7 +635,9 @@ class Henon (ChaosGenerator) :
 
         if not params in Henon.lims :
             a, b = params
-            x, y = np.random.rand(), np.random.rand()
+
+            # Fixed start point so that the limits are reproducible
+            x, y = np.random.default_rng(0).random(2)
             minx, maxx, miny, maxy = x, x, y, y
 
             for _ in range(999999) :
@@ -324,25 +655,29 @@ class Henon (ChaosGenerator) :
             ])
 
 
-    def __init__ (self, oshape, params=(1.4, 0.3), cascade=True, comp=0, gens=2) :
+    def __init__ (self, oshape, params=(1.4, 0.3), cascade=True, comp=0, gens=2, dtype=np.float64, seed=None) :
         """
         Constructor for the Henon chaotic map object
         params          - (a, b) parameters of the Henon map
         """
 
-        super().__init__ (oshape, oshape+(2,), cascade, gens)
+        super().__init__ (oshape, oshape+(2,), cascade, gens, dtype, seed)
         self.params = params
         self.comp = comp
 
         # Setting the limits for the Henon map
         Henon.setLimits(params)
+        self._lims = Henon.lims[params]
+
+        # Holds the previous x iterate while evolving, (Np, D)
+        self._scratch = np.empty(self.gshape[:-1], dtype=self.dtype)
 
         # Per generator
         for i in range(0, self.gens) :
             # Per dimension of Henon map
             for j in [0, 1] :
-                self.cgens[i,...,j] = (lambda st,mn,mx : mn + (mx - mn)*st)\
-                                    (self.cgens[i,...,j], Henon.lims[params][j,0], Henon.lims[params][j,1])
+                mn, mx = self._lims[j]
+                self.cgens[i,...,j] = mn + (mx - mn)*self.cgens[i,...,j]
 
     def evolve (self, gind) :
         """ Evolves the Henon map by one iterate """
@@ -351,19 +686,20 @@ class Henon (ChaosGenerator) :
         eps = 1e-5
 
         # Copying is not necessary as it is being scaled
-        ret = (lambda n2 : np.where (n2 > 1, 1-eps, n2))(
-                (lambda n1 : np.where (n1 < 0, eps, n1))(
-                    (lambda st, mn, mx : (st - mn)/(mx - mn))
-                    (self.cgens[gind,...,self.comp],
-                     Henon.lims[self.params][self.comp,0],
-                     Henon.lims[self.params][self.comp,1])
-                ))
+        mn, mx = self._lims[self.comp]
+        ret = (self.cgens[gind,...,self.comp] - mn)/(mx - mn)
+        ret[ret < 0] = eps
+        ret[ret > 1] = 1-eps
 
+        # In place, x <-- 1 - a*x^2 + y and y <-- b*x
         a, b = self.params
-        x, y = np.copy(self.cgens[gind,...,0]), self.cgens[gind,...,1]
-        x2 = np.square(x)
-        self.cgens[gind,...,0] = 1 - a*x2 + y
-        self.cgens[gind,...,1] = b*x
+        x, y = self.cgens[gind,...,0], self.cgens[gind,...,1]
+        np.copyto(self._scratch, x)
+        np.square(x, out=x)
+        x *= -a
+        x += 1
+        x += y
+        np.multiply(self._scratch, b, out=y)
 
         return ret
 
@@ -374,9 +710,9 @@ class Baker (ChaosGenerator) :
                     (2-2x, 1-y/2) 1/2 <= x < 1
     """
 
-    def __init__ (self, oshape, mu=0.49999, cascade=True, comp=0, gens=2) :
+    def __init__ (self, oshape, mu=0.49999, cascade=True, comp=0, gens=2, dtype=np.float64, seed=None) :
 
-        super().__init__ (oshape, oshape+(2,), cascade, gens)
+        super().__init__ (oshape, oshape+(2,), cascade, gens, dtype, seed)
         self.mu = mu
         self.comp = comp
 